@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, session, send_file
+from flask import Flask, render_template, request, jsonify, session, send_file, url_for, Response, stream_with_context
 import os
 import pandas as pd
 import logging
@@ -10,6 +10,9 @@ from datetime import datetime
 from werkzeug.utils import secure_filename
 import tempfile
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Import your existing modules
 import anu  # Your main processing module
@@ -23,12 +26,36 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 
 # Configuration
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-RESUME_FOLDER = os.path.join(PROJECT_ROOT, "Resumes")
-OUTPUT_CSV = os.path.join(RESUME_FOLDER, "resume_analysis.csv")
+RESUME_FOLDER = anu.RESUME_FOLDER
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
+JOB_STATUS_FOLDER = os.path.join(anu.CACHE_FOLDER, "status")
+
+# Background job queue: worker threads are started on demand up to JOB_WORKERS
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job-worker')
+jobs = {}
+jobs_lock = threading.Lock()
+# A job is claimed across web workers by exclusively creating <status>.lock; the owner touches it on
+# every status update, and a lock left this long without one is taken over (its worker likely died)
+JOB_STATUS_STALE_SECONDS = 30 * 60
+
+# Progress events per job, streamed to clients over server-sent events. An open stream occupies a
+# worker thread, so run gunicorn with the threaded worker class (see gunicorn.conf.py); a sync worker
+# could serve nothing else while a stream is open. Streams still end every SSE_STREAM_MAX_SECONDS
+# and EventSource reconnects with Last-Event-ID, resuming where it left off.
+SSE_KEEPALIVE_SECONDS = 10
+SSE_STREAM_MAX_SECONDS = 25
+SSE_RETRY_MILLISECONDS = 1000
+TERMINAL_EVENTS = ('job_completed', 'job_failed')
+# A finished job's events are kept this long for clients to catch up, then dropped
+JOB_EVENTS_RETENTION_SECONDS = 10 * 60
+job_events = {}
+job_events_finished_at = {}
+job_events_cond = threading.Condition()
 
 # Ensure directories exist
 os.makedirs(RESUME_FOLDER, exist_ok=True)
+os.makedirs(JOB_STATUS_FOLDER, exist_ok=True)
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -56,6 +83,10 @@ def add_to_recent_jobs(job_id):
     session['recent_jobs'] = recent_jobs
     return recent_jobs
 
+def is_valid_job_id(job_id):
+    """Job IDs are alphanumeric with dashes and contain at least one letter and one digit"""
+    return bool(re.match(r'^[A-Za-z0-9-]+$', job_id)) and any(c.isalpha() for c in job_id) and any(c.isdigit() for c in job_id)
+
 def format_candidate_name(name):
     """Format candidate name to ensure it's properly displayed"""
     if not name or pd.isna(name) or name == "N/A":
@@ -84,7 +115,7 @@ def process_job():
             return jsonify({'error': 'Job ID is required'}), 400
         
         # Validate job ID format
-        if not re.match(r'^[A-Za-z0-9-]+$', job_id) or not any(c.isalpha() for c in job_id) or not any(c.isdigit() for c in job_id):
+        if not is_valid_job_id(job_id):
             return jsonify({'error': 'Invalid Job ID format'}), 400
         
         # Add to recent jobs
@@ -94,32 +125,9 @@ def process_job():
         anu.main(job_id)
         
         # Read and return results
-        if not os.path.exists(OUTPUT_CSV):
+        response_data = load_job_results(job_id)
+        if response_data is None:
             return jsonify({'error': 'No results generated'}), 500
-            
-        df = pd.read_csv(OUTPUT_CSV)
-        
-        # Format candidate names
-        if 'Name' in df.columns:
-            df['Name'] = df['Name'].apply(format_candidate_name)
-        
-        # Extract job details
-        job_role = "N/A"
-        subject_skills = []
-        
-        if 'Job Role' in df.columns:
-            job_roles = df['Job Role'].dropna().unique()
-            if len(job_roles) > 0:
-                job_role = job_roles[0]
-        
-        # Prepare response data
-        response_data = {
-            'job_id': job_id,
-            'job_role': job_role,
-            'candidate_count': len(df),
-            'columns': df.columns.tolist(),
-            'data': df.to_dict('records')
-        }
         
         return jsonify(response_data)
         
@@ -128,6 +136,300 @@ def process_job():
         logging.error(traceback.format_exc())
         return jsonify({'error': f'Processing failed: {str(e)}'}), 500
 
+def load_job_results(job_id):
+    """Read a job's result CSV into the JSON response shape, or None if it has no results"""
+    output_csv = anu.get_job_output_csv(job_id)
+    if not os.path.exists(output_csv):
+        return None
+        
+    df = pd.read_csv(output_csv)
+    
+    # Format candidate names
+    if 'Name' in df.columns:
+        df['Name'] = df['Name'].apply(format_candidate_name)
+    
+    # Extract job details
+    job_role = "N/A"
+    subject_skills = []
+    
+    if 'Job Role' in df.columns:
+        job_roles = df['Job Role'].dropna().unique()
+        if len(job_roles) > 0:
+            job_role = job_roles[0]
+    if 'Subject Skills' in df.columns:
+        subject_values = df['Subject Skills'].dropna().unique()
+        if len(subject_values) > 0 and subject_values[0] != "N/A":
+            subject_skills = [s.strip() for s in str(subject_values[0]).split(',') if s.strip()]
+    
+    # Prepare response data
+    records = json.loads(df.to_json(orient='records'))
+    return {
+        'success': True,
+        'job_id': job_id,
+        'job_role': job_role,
+        'subject_skills': subject_skills,
+        'candidate_count': len(df),
+        'columns': df.columns.tolist(),
+        'data': records,
+        'candidates': records
+    }
+
+def get_job_status_path(job_id):
+    return os.path.join(JOB_STATUS_FOLDER, f"{secure_filename(job_id)}.json")
+
+def get_job_lock_path(job_id):
+    return f"{get_job_status_path(job_id)}.lock"
+
+def claim_job(job_id):
+    """Atomically claim a job for this worker; False if another worker holds a live claim"""
+    lock_path = get_job_lock_path(job_id)
+    os.makedirs(JOB_STATUS_FOLDER, exist_ok=True)
+    for attempt in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if attempt or time.time() - os.path.getmtime(lock_path) < JOB_STATUS_STALE_SECONDS:
+                    return False
+                logging.warning(f"Taking over stale claim on job {job_id}")
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+def release_job(job_id):
+    """Drop this worker's claim on a finished job"""
+    try:
+        os.remove(get_job_lock_path(job_id))
+    except FileNotFoundError:
+        pass
+
+def update_job(job_id, **fields):
+    """Update a background job's status and persist it so every web worker can serve it"""
+    with jobs_lock:
+        job = jobs[job_id]
+        job.update(fields)
+        job['updated_at'] = time.time()
+        snapshot = dict(job)
+    status_path = get_job_status_path(job_id)
+    temp_path = f"{status_path}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temp_path, status_path)
+        if snapshot['status'] in ('queued', 'running'):
+            # Keep the claim fresh so other workers do not take it over as stale
+            os.utime(get_job_lock_path(job_id))
+    except Exception as e:
+        logging.warning(f"Could not persist status for job {job_id}: {e}")
+    return snapshot
+
+def get_job_status(job_id):
+    """
+    Current status of a background job. A job active in this worker is served from the registry;
+    otherwise the newer of the registry entry and the persisted status file wins, since another
+    worker may have re-run the job since.
+    """
+    with jobs_lock:
+        local = dict(jobs[job_id]) if job_id in jobs else None
+    if local and local['status'] in ('queued', 'running'):
+        return local
+    persisted = None
+    status_path = get_job_status_path(job_id)
+    if os.path.exists(status_path):
+        try:
+            with open(status_path) as f:
+                persisted = json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not read status for job {job_id}: {e}")
+    if local and (not persisted or local.get('updated_at', 0) >= persisted.get('updated_at', 0)):
+        return local
+    return persisted
+
+def publish_event(job_id, event):
+    """
+    Append an event to the job's event log and wake any streaming clients. Event logs of jobs that
+    finished more than JOB_EVENTS_RETENTION_SECONDS ago are dropped along the way.
+    """
+    with job_events_cond:
+        job_events.setdefault(job_id, []).append(event)
+        now = time.time()
+        if event['event'] in TERMINAL_EVENTS:
+            job_events_finished_at[job_id] = now
+        for finished_id, finished_at in list(job_events_finished_at.items()):
+            if now - finished_at > JOB_EVENTS_RETENTION_SECONDS:
+                job_events.pop(finished_id, None)
+                del job_events_finished_at[finished_id]
+        job_events_cond.notify_all()
+
+def make_progress_callback(job_id):
+    """anu progress callback that records the stage, counts and an ETA, and publishes each event"""
+    def progress(event):
+        now = time.time()
+        stage = event['stage']
+        done, total = event.get('done'), event.get('total')
+        with jobs_lock:
+            job = jobs[job_id]
+            stage_started_at = job['stage_started_at'] if job['stage'] == stage else now
+        eta_seconds = None
+        if done and total:
+            rate = event.get('rate_per_second') or done / max(now - stage_started_at, 1e-6)
+            eta_seconds = round((total - done) / rate, 1)
+        update_job(
+            job_id,
+            stage=stage,
+            stage_started_at=stage_started_at,
+            counts={'done': done, 'total': total},
+            eta_seconds=eta_seconds,
+            last_event=event['event']
+        )
+        publish_event(job_id, event)
+    return progress
+
+def run_background_job(job_id):
+    """Worker body: run the anu pipeline for a job and record the outcome"""
+    update_job(job_id, status='running', started_at=time.time())
+    publish_event(job_id, {'stage': 'queued', 'event': 'job_started', 'timestamp': time.time()})
+    try:
+        output_csv = anu.main(job_id, progress=make_progress_callback(job_id))
+        if output_csv:
+            update_job(job_id, status='completed', stage='completed', eta_seconds=0, finished_at=time.time())
+            publish_event(job_id, {'stage': 'completed', 'event': 'job_completed', 'timestamp': time.time()})
+        else:
+            update_job(job_id, status='failed', error='No results generated', finished_at=time.time())
+            publish_event(job_id, {'stage': 'failed', 'event': 'job_failed', 'error': 'No results generated', 'timestamp': time.time()})
+    except Exception as e:
+        logging.error(f"Background job {job_id} failed: {str(e)}")
+        logging.error(traceback.format_exc())
+        update_job(job_id, status='failed', error=str(e), finished_at=time.time())
+        publish_event(job_id, {'stage': 'failed', 'event': 'job_failed', 'error': str(e), 'timestamp': time.time()})
+    finally:
+        release_job(job_id)
+
+def submit_job(job_id):
+    """Queue a job unless it is already queued or running in any worker; returns its status"""
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job and job['status'] in ('queued', 'running'):
+            return dict(job)
+    if not claim_job(job_id):
+        status = get_job_status(job_id)
+        if status and status['status'] in ('queued', 'running'):
+            return status
+        # The claiming worker has not written its first status yet
+        return {'job_id': job_id, 'status': 'queued', 'stage': 'queued', 'counts': {}, 'eta_seconds': None, 'error': None}
+    with jobs_lock:
+        now = time.time()
+        jobs[job_id] = {
+            'job_id': job_id,
+            'status': 'queued',
+            'stage': 'queued',
+            'stage_started_at': now,
+            'counts': {},
+            'eta_seconds': None,
+            'error': None,
+            'submitted_at': now
+        }
+    with job_events_cond:
+        job_events[job_id] = []
+        job_events_finished_at.pop(job_id, None)
+    snapshot = update_job(job_id)
+    job_executor.submit(run_background_job, job_id)
+    return snapshot
+
+@app.route('/api/process', methods=['POST'])
+def submit_process_job():
+    """Queue a job ID for background processing and return immediately"""
+    payload = request.get_json(silent=True) or {}
+    job_id = (request.form.get('job_id') or payload.get('job_id') or '').strip()
+    if not job_id:
+        return jsonify({'error': 'Job ID is required'}), 400
+    if not is_valid_job_id(job_id):
+        return jsonify({'error': 'Invalid Job ID format'}), 400
+
+    add_to_recent_jobs(job_id)
+    job = submit_job(job_id)
+    job['status_url'] = url_for('get_process_job_status', job_id=job_id)
+    job['results_url'] = url_for('get_process_job_results', job_id=job_id)
+    job['events_url'] = url_for('stream_process_job_events', job_id=job_id)
+    return jsonify(job), 202
+
+@app.route('/api/process/<job_id>')
+def get_process_job_status(job_id):
+    """Poll a background job's status, stage, counts and ETA"""
+    job = get_job_status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+def format_sse(event, event_id=None):
+    """Encode one event as a server-sent events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+def stream_job_events(job_id, next_index):
+    """
+    Yield the job's events from next_index on until it finishes or SSE_STREAM_MAX_SECONDS pass,
+    with periodic keep-alives. The client reconnects after a timed-out stream.
+    """
+    deadline = time.monotonic() + SSE_STREAM_MAX_SECONDS
+    yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+    while time.monotonic() < deadline:
+        with job_events_cond:
+            events = job_events.get(job_id, [])
+            if len(events) <= next_index:
+                job_events_cond.wait(timeout=min(SSE_KEEPALIVE_SECONDS, max(deadline - time.monotonic(), 0)))
+                events = job_events.get(job_id, [])
+            pending = events[next_index:]
+        if not pending:
+            yield ": keep-alive\n\n"
+            continue
+        for event in pending:
+            yield format_sse(event, next_index)
+            next_index += 1
+            if event['event'] in TERMINAL_EVENTS:
+                return
+
+@app.route('/api/process/<job_id>/events')
+def stream_process_job_events(job_id):
+    """Stream a background job's progress events as server-sent events"""
+    with job_events_cond:
+        tracked = job_id in job_events
+    if not tracked:
+        # Job ran in another worker (or before a restart): send its last known status and close
+        job = get_job_status(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        body = format_sse({'stage': job.get('stage'), 'event': 'status', 'status': job})
+        return Response(body, mimetype='text/event-stream')
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    next_index = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    return Response(
+        stream_with_context(stream_job_events(job_id, next_index)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/process/<job_id>/results')
+def get_process_job_results(job_id):
+    """Fetch the results of a finished background job"""
+    job = get_job_status(job_id)
+    if job and job['status'] in ('queued', 'running'):
+        return jsonify({'error': 'Job is still running', 'status': job['status'], 'stage': job['stage']}), 409
+    response_data = load_job_results(job_id)
+    if response_data is None:
+        return jsonify({'error': (job or {}).get('error') or 'Results not found'}), 404
+    return jsonify(response_data)
+
 @app.route('/upload', methods=['POST'])
 def upload_resumes():
     """Manual resume upload endpoint"""
@@ -174,11 +476,7 @@ def upload_resumes():
 def download_results(job_id):
     """Download results as CSV"""
     try:
-        csv_path = os.path.join(RESUME_FOLDER, f"resume_analysis_{job_id}.csv")
-        
-        # Use the main output CSV if job-specific doesn't exist
-        if not os.path.exists(csv_path):
-            csv_path = OUTPUT_CSV
+        csv_path = anu.get_job_output_csv(job_id)
             
         if not os.path.exists(csv_path):
             return jsonify({'error': 'Results not found'}), 404
@@ -189,7 +487,7 @@ def download_results(job_id):
             df['Name'] = df['Name'].apply(format_candidate_name)
         
         # Save the formatted version temporarily
-        formatted_path = os.path.join(RESUME_FOLDER, f"formatted_{job_id}.csv")
+        formatted_path = os.path.join(RESUME_FOLDER, f"formatted_{secure_filename(job_id)}.csv")
         df.to_csv(formatted_path, index=False)
             
         return send_file(
@@ -0,0 +1,10 @@
+# gunicorn settings for app:app (loaded automatically from the working directory)
+import os
+
+# Server-sent event streams hold a request open for up to SSE_STREAM_MAX_SECONDS, so each worker
+# serves requests from a thread pool; with the default sync worker one open stream would block the
+# worker's status polls and every other client
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+timeout = 60
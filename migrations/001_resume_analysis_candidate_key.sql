@@ -0,0 +1,9 @@
+-- Enables idempotent upserts from store_results_in_supabase (SUPABASE_UPSERT=true).
+-- candidate_key is a hash of the candidate's normalized name, location and year of birth.
+
+ALTER TABLE resume_analysis ADD COLUMN IF NOT EXISTS candidate_key text;
+
+-- Rows written before this migration have no key and are left as they are; the unique
+-- constraint only applies to keyed rows because NULLs never conflict.
+ALTER TABLE resume_analysis
+    ADD CONSTRAINT resume_analysis_job_candidate_key UNIQUE (job_id, candidate_key);
@@ -0,0 +1,123 @@
+import base64
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anu
+
+
+class FakeRequest:
+    def __init__(self, key):
+        self.key = key
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batch_sizes.append(len(self.requests))
+        if len(self.requests) > anu.GMAIL_BATCH_SIZE:
+            raise AssertionError("Gmail batch requests accept at most 100 calls")
+        for request_id, request in self.requests:
+            if request.key in self.service.failing:
+                self.callback(request_id, None, Exception(f"404 {request.key}"))
+            else:
+                self.callback(request_id, self.service.responses[request.key], None)
+
+
+class FakeAttachments:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, userId, messageId, id):
+        return FakeRequest((messageId, id))
+
+
+class FakeMessages:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, userId, id, format="full", **kwargs):
+        return FakeRequest(id)
+
+    def attachments(self):
+        return FakeAttachments(self.service)
+
+
+class FakeUsers:
+    def __init__(self, service):
+        self.service = service
+
+    def messages(self):
+        return FakeMessages(self.service)
+
+
+class FakeGmailService:
+    """Answers batched messages.get / attachments.get calls from a dict of canned responses."""
+
+    def __init__(self, responses, failing=()):
+        self.responses = responses
+        self.failing = set(failing)
+        self.batch_sizes = []
+
+    def users(self):
+        return FakeUsers(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(monkeypatch):
+    monkeypatch.setattr(anu.gmail_rate_limiter, "acquire", lambda amount=1: None)
+    for cache in (anu._message_cache, anu._attachment_cache, anu._attachment_text_cache):
+        cache.clear()
+    yield
+    for cache in (anu._message_cache, anu._attachment_cache, anu._attachment_text_cache):
+        cache.clear()
+
+
+def test_fetch_messages_batch_chunks_at_batch_limit():
+    message_ids = [f"m{i}" for i in range(250)]
+    service = FakeGmailService({mid: {"id": mid} for mid in message_ids})
+
+    failures = anu.fetch_messages_batch(service, message_ids)
+
+    assert failures == {}
+    assert service.batch_sizes == [100, 100, 50]
+    assert all(anu._message_cache[(mid, "full")] == {"id": mid} for mid in message_ids)
+
+
+def test_fetch_messages_batch_failed_item_leaves_others_cached():
+    message_ids = ["m1", "m2", "m3"]
+    service = FakeGmailService({mid: {"id": mid} for mid in message_ids}, failing={"m2"})
+
+    failures = anu.fetch_messages_batch(service, message_ids)
+
+    assert list(failures) == ["m2"]
+    assert ("m2", "full") not in anu._message_cache
+    assert anu._message_cache[("m1", "full")] == {"id": "m1"}
+    assert anu._message_cache[("m3", "full")] == {"id": "m3"}
+
+
+def test_fetch_attachments_batch_chunks_and_skips_failed_item():
+    keys = [(f"m{i}", f"a{i}") for i in range(150)]
+    responses = {key: {"data": base64.urlsafe_b64encode(key[1].encode()).decode()} for key in keys}
+    service = FakeGmailService(responses, failing={keys[42]})
+
+    failures = anu.fetch_attachments_batch(service, keys)
+
+    assert list(failures) == [keys[42]]
+    assert service.batch_sizes == [100, 50]
+    assert keys[42] not in anu._attachment_cache
+    assert anu._attachment_cache[keys[0]] == b"a0"
+    assert anu._attachment_cache[keys[149]] == b"a149"